@@ -23,8 +23,16 @@ def create_app(config_name=None):
         raise ValueError(f"Invalid configuration name: {config_name}")
 
     # Initialize extensions
+    from .admission import init_admission
+    from .group_commit import init_group_commit
+    from .stats import init_stats
+    from .auth import init_auth
     db.init_app(app)
     swagger = init_swagger(app)
+    init_admission(app)
+    init_group_commit(app)
+    init_stats(app)
+    init_auth(app)
 
     # Register blueprints
     from .routes import api_bp
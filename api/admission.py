@@ -0,0 +1,200 @@
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from . import db
+from .metrics import metrics
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of its deadline outside the database (e.g. while queued)."""
+
+
+def admission_exempt(f):
+    """Mark a view so it is never shed or given a deadline (e.g. health/metrics)."""
+    f.admission_exempt = True
+    return f
+
+
+class AdmissionController:
+    """
+    Per-worker admission control.
+
+    Caps the number of in-flight requests, sheds new ones once too many are
+    waiting or recent requests have become too slow, and tracks a smoothed
+    request latency used for the latency threshold.
+    """
+
+    def __init__(self, max_inflight, max_queue, queue_timeout, latency_threshold_ms):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_threshold_ms = latency_threshold_ms
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.latency_ms = 0.0
+
+    def acquire(self, timeout):
+        """
+        Try to take an in-flight slot.
+
+        Returns:
+            str: None if admitted, otherwise the reason the request was shed.
+        """
+        if self._slots.acquire(blocking=False):
+            return None
+
+        # No free slot: only queue if the backlog is short and we are not already slow
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                return "queue_depth"
+            if self.latency_threshold_ms and self.latency_ms > self.latency_threshold_ms:
+                return "latency"
+            self.waiting += 1
+        try:
+            if not self._slots.acquire(timeout=max(0.0, min(timeout, self.queue_timeout))):
+                return "queue_timeout"
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        return None
+
+    def release(self, duration_ms):
+        """Give back a slot and fold the request duration into the latency average."""
+        with self._lock:
+            self.latency_ms = duration_ms if not self.latency_ms else 0.8 * self.latency_ms + 0.2 * duration_ms
+        self._slots.release()
+
+
+def init_admission(app):
+    """Register load shedding, request deadlines and statement timeouts on the app."""
+    if not app.config.get('ADMISSION_CONTROL_ENABLED', True):
+        return
+
+    app.extensions['admission'] = AdmissionController(
+        max_inflight=app.config['MAX_INFLIGHT_REQUESTS'],
+        max_queue=app.config['SHED_QUEUE_DEPTH'],
+        queue_timeout=app.config['SHED_QUEUE_TIMEOUT'],
+        latency_threshold_ms=app.config['SHED_LATENCY_MS'],
+    )
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'checkin', _clear_progress_handler)
+    app.before_request(_admit_request)
+    app.teardown_request(_finish_request)
+    app.register_error_handler(OperationalError, _handle_operational_error)
+    app.register_error_handler(DeadlineExceeded, lambda e: _deadline_exceeded())
+
+
+def _is_exempt():
+    if request.blueprint != 'api' or request.method == 'OPTIONS':
+        return True
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'admission_exempt', False)
+
+
+def _request_budget_ms():
+    """Server budget for this request, shortened by the client's deadline header if given."""
+    config = current_app.config
+    if request.method in READ_METHODS:
+        budget = config['READ_DEADLINE_MS']
+    else:
+        budget = config['WRITE_DEADLINE_MS']
+
+    client_budget = request.headers.get(config['DEADLINE_HEADER'])
+    if client_budget is not None:
+        try:
+            budget = min(budget, max(int(client_budget), 0))
+        except ValueError:
+            pass  # ignore malformed values, fall back to the server budget
+    return budget
+
+
+def _shed(reason):
+    metrics.incr("requests_shed")
+    metrics.incr(f"requests_shed.{reason}")
+    response = jsonify({"error": "Server is overloaded, please retry later."})
+    response.headers['Retry-After'] = str(current_app.config['SHED_RETRY_AFTER'])
+    return response, 503
+
+
+def _deadline_exceeded():
+    metrics.incr("requests_timed_out")
+    return jsonify({"error": "Request deadline exceeded."}), 504
+
+
+def _admit_request():
+    if _is_exempt():
+        return None
+
+    start = time.monotonic()
+    budget_ms = _request_budget_ms()
+    g.deadline = start + budget_ms / 1000.0
+
+    reason = current_app.extensions['admission'].acquire(timeout=budget_ms / 1000.0)
+    if reason:
+        return _shed(reason)
+    g.admission_start = start
+
+    if time.monotonic() >= g.deadline:
+        return _deadline_exceeded()
+    # The database timeout is applied lazily, per transaction (see _apply_statement_timeout)
+    return None
+
+
+@event.listens_for(db.session, 'after_begin')
+def _apply_statement_timeout(session, transaction, connection):
+    """
+    Turn the request deadline into a database-side timeout for each new transaction.
+
+    The deadline comes from session.info['deadline'] if set (group commit runs
+    batches in its own session), otherwise from the current request.
+    """
+    if 'deadline' in session.info:
+        deadline = session.info['deadline']
+    elif has_request_context():
+        deadline = g.get('deadline')
+    else:
+        deadline = None
+    if deadline is None:
+        return
+
+    if connection.dialect.name == 'postgresql':
+        # SET LOCAL only lasts for this transaction; a later one gets its own
+        timeout_ms = max(1, int((deadline - time.monotonic()) * 1000))
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+    elif connection.dialect.name == 'sqlite':
+        # SQLite has no statement timeout; abort long-running statements from the VM instead.
+        # The handler is removed when the connection goes back to the pool (_clear_progress_handler).
+        connection.connection.dbapi_connection.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+
+
+def _clear_progress_handler(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.set_progress_handler(None, 0)
+
+
+def _finish_request(exc):
+    start = g.pop('admission_start', None)
+    if start is not None:
+        current_app.extensions['admission'].release((time.monotonic() - start) * 1000)
+
+
+def _handle_operational_error(e):
+    message = str(e.orig).lower()
+    timed_out = (
+        time.monotonic() >= g.get('deadline', float('inf'))
+        or 'statement timeout' in message
+        or 'interrupted' in message
+    )
+    if not timed_out:
+        raise e
+    db.session.rollback()
+    return _deadline_exceeded()
@@ -1,12 +1,170 @@
-from flask import request, jsonify, current_app
+import hashlib
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import namedtuple
 from functools import wraps
 
+import click
+from flask import request, jsonify, current_app, make_response
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db
+from .metrics import metrics
+from .models import ApiKey
+from .ratelimit import SQLiteRateLimiter
+
+KeyEntry = namedtuple('KeyEntry', ['name', 'key_hash', 'rate', 'burst', 'quota'])
+
+
+def hash_api_key(api_key):
+    """Return the hex SHA-256 digest under which an API key is stored."""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+class ApiKeyIndex:
+    """
+    In-memory index of valid API keys, keyed by their hash.
+
+    The index is reloaded from the api_key table every `refresh_seconds`, so
+    keys created or revoked with the CLI take effect without a restart. The
+    static API_KEY from the config is always included as the "default" key.
+    """
+
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._loaded_at = None
+
+    def lookup(self, api_key):
+        """Return the KeyEntry for `api_key`, or None if it is not a valid key."""
+        self._refresh_if_stale()
+        # Keys are looked up by their SHA-256 hash, never compared in plain text, so
+        # lookup timing reveals nothing about how much of a guessed key is right
+        return self._keys.get(hash_api_key(api_key))
+
+    def _refresh_if_stale(self):
+        if not self._stale():
+            return
+        # Only the very first load makes requests wait; after that one thread
+        # reloads while the others keep using the current keys
+        if not self._lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if not self._stale():
+                return  # another thread refreshed while we waited
+            try:
+                self._keys = self._load()
+            except SQLAlchemyError:
+                current_app.logger.exception("Could not refresh API keys, keeping the previous set")
+                if not self._keys:
+                    self._keys = self._load(include_stored=False)
+            self._loaded_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def _stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    def _load(self, include_stored=True):
+        config = current_app.config
+
+        def entry(name, key_hash, rate=None, burst=None, quota=None):
+            return KeyEntry(
+                name=name,
+                key_hash=key_hash,
+                rate=rate if rate is not None else config['RATE_LIMIT_DEFAULT_RATE'],
+                burst=burst if burst is not None else config['RATE_LIMIT_DEFAULT_BURST'],
+                quota=quota if quota is not None else config['RATE_LIMIT_DEFAULT_QUOTA'],
+            )
+
+        keys = {}
+        if config.get('API_KEY'):
+            static_hash = hash_api_key(config['API_KEY'])
+            keys[static_hash] = entry('default', static_hash)
+        if include_stored:
+            # Own connection, so a failure cannot disturb the request's session and transaction
+            table = ApiKey.__table__
+            with db.engine.connect() as connection:
+                rows = connection.execute(select(table).where(table.c.active.is_(True))).all()
+            for key in rows:
+                keys[key.key_hash] = entry(key.name, key.key_hash, key.rate_limit, key.burst, key.quota)
+        return keys
+
+
+def rate_limit_headers(decision):
+    if decision.limit is None:
+        return {}  # neither a token bucket nor a quota applies
+    return {
+        'RateLimit-Limit': str(decision.limit),
+        'RateLimit-Remaining': str(decision.remaining),
+        'RateLimit-Reset': str(decision.reset),
+    }
+
+
 # Decorator to require API key for a route
 def require_api_key(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         api_key = request.headers.get('X-API-Key')
-        if api_key == current_app.config["API_KEY"]:  # Fetch the API key from config
+        entry = current_app.extensions['api_keys'].lookup(api_key) if api_key else None
+        if entry is None:
+            return jsonify({"error": "Invalid API key"}), 401
+
+        limiter = current_app.extensions.get('rate_limiter')
+        if limiter is None:
             return f(*args, **kwargs)
-        return jsonify({"error": "Invalid API key"}), 401
+
+        # Buckets are per key, so one client's batch job cannot use up everyone's capacity
+        try:
+            decision = limiter.hit(entry.key_hash, entry.rate, entry.burst, entry.quota)
+        except sqlite3.Error:
+            # A locked or broken limiter file must not take the API down: fail open
+            current_app.logger.exception("Rate limiter unavailable, serving the request unlimited")
+            metrics.incr("rate_limiter_errors")
+            return f(*args, **kwargs)
+        if decision.allowed:
+            response = make_response(f(*args, **kwargs))
+        else:
+            metrics.incr("requests_rate_limited")
+            response = make_response(jsonify({"error": "Rate limit exceeded"}), 429)
+            response.headers['Retry-After'] = str(decision.retry_after)
+        response.headers.update(rate_limit_headers(decision))
+        return response
     return decorated
+
+
+def init_auth(app):
+    """Set up the API key index, the shared rate limiter and the key management commands."""
+    app.extensions['api_keys'] = ApiKeyIndex(app.config['API_KEY_REFRESH_SECONDS'])
+    if app.config['RATE_LIMIT_ENABLED']:
+        path = app.config['RATE_LIMIT_DB_PATH'] or os.path.join(app.instance_path, 'ratelimit.db')
+        app.extensions['rate_limiter'] = SQLiteRateLimiter(path, app.config['RATE_LIMIT_QUOTA_PERIOD'])
+
+    @app.cli.command('create-api-key')
+    @click.argument('name')
+    @click.option('--rate', type=click.FloatRange(min=0), help='Requests per second, 0 for quota only (default: RATE_LIMIT_DEFAULT_RATE).')
+    @click.option('--burst', type=click.IntRange(min=1), help='Bucket size (default: RATE_LIMIT_DEFAULT_BURST).')
+    @click.option('--quota', type=click.IntRange(min=0), help='Requests per quota period, 0 for none (default: RATE_LIMIT_DEFAULT_QUOTA).')
+    def create_api_key_command(name, rate, burst, quota):
+        """Create an API key for NAME and print it (it is not stored in plain text)."""
+        db.create_all()  # creates api_key on databases that predate it
+        api_key = secrets.token_urlsafe(32)
+        db.session.add(ApiKey(name=name, key_hash=hash_api_key(api_key), rate_limit=rate, burst=burst, quota=quota))
+        db.session.commit()
+        click.echo(api_key)
+
+    @app.cli.command('revoke-api-key')
+    @click.argument('name')
+    def revoke_api_key_command(name):
+        """Deactivate the API key of NAME."""
+        key = ApiKey.query.filter_by(name=name).first()
+        if key is None:
+            raise click.ClickException(f"No API key named '{name}'.")
+        key.active = False
+        db.session.commit()
+        click.echo(f"Revoked API key '{name}'.")
@@ -7,6 +7,34 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.environ.get('SECRET_KEY', 'aJNisndsjd6YVHDS') # app key
     API_KEY = os.environ.get("API_KEY", "fake-key")  # Default API key for development
+    API_KEY_REFRESH_SECONDS = int(os.environ.get('API_KEY_REFRESH_SECONDS', 30))  # reload keys created with the CLI
+
+    # Per-key token-bucket rate limits, shared by all workers through a local SQLite file
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_DB_PATH = os.environ.get('RATE_LIMIT_DB_PATH')  # defaults to <instance>/ratelimit.db
+    RATE_LIMIT_DEFAULT_RATE = float(os.environ.get('RATE_LIMIT_DEFAULT_RATE', 10))  # requests per second, 0 = quota only
+    RATE_LIMIT_DEFAULT_BURST = int(os.environ.get('RATE_LIMIT_DEFAULT_BURST', 100))
+    RATE_LIMIT_DEFAULT_QUOTA = int(os.environ.get('RATE_LIMIT_DEFAULT_QUOTA', 0))  # per quota period, 0 = unlimited
+    RATE_LIMIT_QUOTA_PERIOD = int(os.environ.get('RATE_LIMIT_QUOTA_PERIOD', 86400))  # seconds
+
+    # Admission control / load shedding (limits are per worker process)
+    ADMISSION_CONTROL_ENABLED = os.environ.get('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true'
+    MAX_INFLIGHT_REQUESTS = int(os.environ.get('MAX_INFLIGHT_REQUESTS', 16))
+    SHED_QUEUE_DEPTH = int(os.environ.get('SHED_QUEUE_DEPTH', 32))  # max requests waiting for a slot
+    SHED_QUEUE_TIMEOUT = float(os.environ.get('SHED_QUEUE_TIMEOUT', 1.0))  # seconds to wait for a slot
+    SHED_LATENCY_MS = int(os.environ.get('SHED_LATENCY_MS', 2000))  # shed instead of queueing above this (0 = off)
+    SHED_RETRY_AFTER = int(os.environ.get('SHED_RETRY_AFTER', 1))  # Retry-After seconds on 503
+
+    # Request deadlines, applied to the database as statement timeouts
+    READ_DEADLINE_MS = int(os.environ.get('READ_DEADLINE_MS', 5000))
+    WRITE_DEADLINE_MS = int(os.environ.get('WRITE_DEADLINE_MS', 10000))
+    DEADLINE_HEADER = 'X-Request-Deadline-Ms'  # client-supplied budget in milliseconds
+
+    # Group commit: coalesce concurrent add/update writes into one transaction (opt-in)
+    WRITE_COALESCING_ENABLED = os.environ.get('WRITE_COALESCING_ENABLED', 'false').lower() == 'true'
+    WRITE_COALESCING_WINDOW_MS = float(os.environ.get('WRITE_COALESCING_WINDOW_MS', 5))
+    WRITE_COALESCING_MAX_BATCH = int(os.environ.get('WRITE_COALESCING_MAX_BATCH', 32))
+    WRITE_COALESCING_MIN_BUDGET_MS = float(os.environ.get('WRITE_COALESCING_MIN_BUDGET_MS', 50))  # less left: commit alone
 
 class DevelopmentConfig(Config):
     """Development environment settings."""
@@ -0,0 +1,195 @@
+import threading
+import time
+
+from flask import current_app, g, jsonify
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .admission import DeadlineExceeded
+from .metrics import metrics
+
+
+def run_write(op):
+    """
+    Apply a single-row write and commit it.
+
+    `op(session)` adds or changes objects on the session and returns the
+    (payload, status) for the response. It may be run more than once, so it
+    must not have side effects outside the session.
+
+    With WRITE_COALESCING_ENABLED the commit is shared with other concurrent
+    writes; otherwise the write is committed on its own.
+
+    Returns:
+        tuple: The JSON response and status code for the request.
+    """
+    committer = current_app.extensions.get('group_commit')
+    if committer is not None:
+        # Hand the pooled connection back while waiting; the batch runs in its own session
+        db.session.close()
+        payload, status = committer.submit(op, deadline=g.get('deadline'))
+    else:
+        payload, status = _run_alone(op, db.session)
+    return jsonify(payload), status
+
+
+def _run_alone(op, session):
+    try:
+        result = op(session)
+        session.commit()
+        return result
+    except IntegrityError:
+        session.rollback()
+        return {"error": "The write conflicts with existing data (e.g. a duplicate ISBN)."}, 409
+    except Exception:
+        session.rollback()
+        raise
+
+
+def _remaining(item):
+    return float('inf') if item.deadline is None else item.deadline - time.monotonic()
+
+
+class _PendingWrite:
+    def __init__(self, op, deadline):
+        self.op = op
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.run_alone = False
+        self.result = None
+        self.error = None
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+
+class GroupCommitter:
+    """
+    Coalesces concurrent writes into one transaction per worker.
+
+    The first request to arrive while no batch is open becomes the leader: it
+    waits up to `window_ms` (or until `max_batch` writes are queued), then runs
+    every queued write in a separate session and commits once. The other
+    requests wait for the leader and get their own result back. If the shared
+    transaction fails, it is rolled back and each write is retried in a
+    transaction of its own, so one conflict does not fail the whole batch.
+
+    Every write keeps its request deadline. A request never waits past it,
+    and one with less than `min_budget_ms` left is not batched but committed
+    on its own by its request, so a short client deadline cannot time out
+    (and force a replay of) everyone else's batch.
+    """
+
+    def __init__(self, window_ms, max_batch, min_budget_ms=50):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.min_budget = min_budget_ms / 1000.0
+        self._cond = threading.Condition()
+        self._pending = []
+        self._collecting = False
+
+    def submit(self, op, deadline=None):
+        """
+        Queue a write and block until it has been committed (or has failed).
+
+        Args:
+            op (callable): The write, see run_write.
+            deadline (float): time.monotonic() value after which the request gives up, or None.
+        """
+        item = _PendingWrite(op, deadline)
+        if _remaining(item) < self.min_budget:
+            return _run_alone(op, db.session)
+
+        with self._cond:
+            self._pending.append(item)
+            is_leader = not self._collecting
+            if is_leader:
+                self._collecting = True
+            elif len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+
+        if is_leader:
+            # Stop collecting early enough that the leader's own write still has its minimum budget
+            window = max(0.0, min(self.window, _remaining(item) - self.min_budget))
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pending) >= self.max_batch, timeout=window)
+                batch, self._pending = self._pending, []
+                self._collecting = False
+            self._execute(batch)
+        elif not item.done.wait(timeout=max(0.0, _remaining(item))):
+            with self._cond:
+                if item in self._pending:
+                    self._pending.remove(item)
+            # Whether still queued or already in a running batch, the request's time is up
+            # (a write already in the batch may still commit, as with any timeout)
+            if not item.done.is_set():
+                raise DeadlineExceeded()
+
+        if item.run_alone:
+            return _run_alone(op, db.session)
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _execute(self, batch):
+        started = time.monotonic()
+        live = []
+        for item in batch:
+            remaining = _remaining(item)
+            if remaining <= 0:
+                metrics.incr("group_commit.expired")
+                item.finish(error=DeadlineExceeded())
+            elif remaining < self.min_budget:
+                # Too little time left to share a batch: its request commits it alone
+                metrics.incr("group_commit.run_alone")
+                item.run_alone = True
+                item.done.set()
+            else:
+                metrics.observe("group_commit.added_latency_ms", (started - item.enqueued) * 1000)
+                live.append(item)
+        if not live:
+            return
+        metrics.observe("group_commit.batch_size", len(live))
+
+        # A separate session, so each transaction gets the batch's (or the item's) deadline.
+        # The batch may run until its latest member's deadline; members with earlier
+        # deadlines stop waiting for it on their own.
+        session = db.session.session_factory()
+        deadlines = [item.deadline for item in live]
+        session.info['deadline'] = None if None in deadlines else max(deadlines)
+        try:
+            try:
+                results = [item.op(session) for item in live]
+                session.commit()
+            except Exception:
+                session.rollback()
+                metrics.incr("group_commit.fallbacks")
+                for item in live:
+                    if _remaining(item) <= 0:
+                        item.finish(error=DeadlineExceeded())
+                        continue
+                    session.info['deadline'] = item.deadline
+                    try:
+                        item.finish(result=_run_alone(item.op, session))
+                    except Exception as e:
+                        item.finish(error=e)
+            else:
+                for item, result in zip(live, results):
+                    item.finish(result=result)
+        finally:
+            session.close()
+            for item in live:
+                item.done.set()
+
+
+def init_group_commit(app):
+    """Enable write coalescing on the app if configured."""
+    if app.config.get('WRITE_COALESCING_ENABLED', False):
+        app.extensions['group_commit'] = GroupCommitter(
+            window_ms=app.config['WRITE_COALESCING_WINDOW_MS'],
+            max_batch=app.config['WRITE_COALESCING_MAX_BATCH'],
+            min_budget_ms=app.config['WRITE_COALESCING_MIN_BUDGET_MS'],
+        )
@@ -0,0 +1,47 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """
+    Minimal in-process counters and observations.
+
+    Values are kept per worker process; each gunicorn worker reports its own
+    numbers through GET /api/metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._observations = {}
+
+    def incr(self, name, value=1):
+        """Increment the counter `name` by `value`."""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name, value):
+        """Record a single sample (e.g. a latency or a batch size) under `name`."""
+        with self._lock:
+            stats = self._observations.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            stats["count"] += 1
+            stats["sum"] += value
+            stats["max"] = max(stats["max"], value)
+
+    def snapshot(self):
+        """Return a JSON serialisable copy of all counters and observations."""
+        with self._lock:
+            observations = {
+                name: dict(stats, avg=stats["sum"] / stats["count"] if stats["count"] else 0.0)
+                for name, stats in self._observations.items()
+            }
+            return {"counters": dict(self._counters), "observations": observations}
+
+    def reset(self):
+        """Clear everything (used by tests)."""
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+
+
+metrics = Metrics()
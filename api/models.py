@@ -4,8 +4,26 @@ from datetime import datetime, timezone
 class Book(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
-    author = db.Column(db.String(100), nullable=False)
+    # active_history keeps the old value on update so BookStat can be adjusted (see api/stats.py)
+    author = db.column_property(db.Column(db.String(100), nullable=False), active_history=True)
     isbn = db.Column(db.String(13), unique=True, nullable=False)
-    publish_date = db.Column(db.Date, nullable=False)
+    publish_date = db.column_property(db.Column(db.Date, nullable=False), active_history=True)
     created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+
+class BookStat(db.Model):
+    """Book counts per grouping, kept up to date on every flush of Book changes."""
+    dimension = db.Column(db.String(10), primary_key=True)  # 'total', 'author', 'year' or 'month'
+    key = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class ApiKey(db.Model):
+    """An API client. Only the SHA-256 hash of the key is stored."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    key_hash = db.Column(db.String(64), unique=True, nullable=False)
+    rate_limit = db.Column(db.Float)  # requests per second, None = RATE_LIMIT_DEFAULT_RATE
+    burst = db.Column(db.Integer)  # None = RATE_LIMIT_DEFAULT_BURST
+    quota = db.Column(db.Integer)  # requests per RATE_LIMIT_QUOTA_PERIOD, None = RATE_LIMIT_DEFAULT_QUOTA
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
@@ -0,0 +1,137 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+Decision = namedtuple('Decision', ['allowed', 'limit', 'remaining', 'reset', 'retry_after'])
+
+
+class SQLiteRateLimiter:
+    """
+    Token-bucket rate limits and quotas shared by all workers on a host.
+
+    State lives in a small local SQLite file (not the application database),
+    so every gunicorn worker sees the same buckets. Each check is a single
+    short BEGIN IMMEDIATE transaction, which serialises concurrent updates to
+    a bucket across processes.
+    """
+
+    max_idle = 8  # connections kept open per process
+
+    def __init__(self, path, quota_period):
+        self.path = path
+        self.quota_period = quota_period
+        # Connections are opened lazily and pooled per process: nothing is opened
+        # in create_app, so nothing is inherited across a gunicorn --preload fork
+        self._lock = threading.Lock()
+        self._pid = None
+        self._idle = []
+
+    @contextmanager
+    def _connection(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._idle = []  # connections from a parent process must not be reused
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+
+        try:
+            yield conn
+        except Exception:
+            conn.close()  # do not pool a connection in an unknown state
+            raise
+
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL,"
+            " quota_used INTEGER NOT NULL, quota_window INTEGER NOT NULL)"
+        )
+        return conn
+
+    def hit(self, key, rate, burst, quota=0):
+        """
+        Take one token from `key`'s bucket.
+
+        Args:
+            key (str): The bucket name (one per API key).
+            rate (float): Tokens added per second, 0 for no token bucket (quota only).
+            burst (int): Bucket capacity.
+            quota (int): Requests allowed per quota period, 0 for no quota.
+
+        Returns:
+            Decision: Whether the request is allowed plus the values for the
+            RateLimit-* headers (limit is None when the key is not limited at all).
+        """
+        bucket = rate > 0
+        now = time.time()
+        window = int(now // self.quota_period)
+        with self._connection() as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT tokens, updated, quota_used, quota_window FROM rate_limit WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    tokens, used = float(burst), 0
+                else:
+                    tokens = min(float(burst), row[0] + max(0.0, now - row[1]) * max(rate, 0))
+                    used = row[2] if row[3] == window else 0
+
+                quota_exceeded = quota and used >= quota
+                allowed = not quota_exceeded and (not bucket or tokens >= 1)
+                if allowed:
+                    if bucket:
+                        tokens -= 1
+                    used += 1
+
+                conn.execute(
+                    "INSERT INTO rate_limit (key, tokens, updated, quota_used, quota_window) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated,"
+                    " quota_used = excluded.quota_used, quota_window = excluded.quota_window",
+                    (key, tokens, now, used, window),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+        window_reset = (window + 1) * self.quota_period - now
+        if bucket:
+            limit, remaining, reset = burst, int(tokens), (burst - tokens) / rate
+            if quota:
+                remaining = max(0, min(remaining, quota - used))
+        elif quota:
+            limit, remaining, reset = quota, max(0, quota - used), window_reset
+        else:
+            limit, remaining, reset = None, None, 0
+
+        if quota_exceeded:
+            reset = retry_after = window_reset
+        else:
+            retry_after = 0 if allowed else (1 - tokens) / rate
+        return Decision(
+            allowed=allowed,
+            limit=limit,
+            remaining=remaining,
+            reset=math.ceil(reset),
+            retry_after=math.ceil(retry_after),
+        )
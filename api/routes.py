@@ -3,6 +3,10 @@ from flask import Blueprint, request, jsonify
 from .models import Book
 from . import db
 from .auth import require_api_key
+from .admission import admission_exempt
+from .metrics import metrics
+from .group_commit import run_write
+from .stats import DIMENSIONS, get_stats
 from .helpers import validate_book_data, validate_isbn
 from datetime import datetime
 
@@ -65,6 +69,52 @@ def get_books():
     } for book in books]), 200
 
 
+@api_bp.route('/books/stats', methods=['GET'])
+@require_api_key
+def get_book_stats():
+    """Get catalogue statistics.
+    ---
+    tags:
+      - Books
+    parameters:
+      - name: by
+        in: query
+        type: string
+        enum: [author, year, month]
+        required: false
+        description: Group the book counts by author, publish year or publish month
+    responses:
+      200:
+        description: The total number of books and, if requested, the count per group
+        schema:
+          type: object
+          properties:
+            total:
+              type: integer
+            by:
+              type: string
+            groups:
+              type: array
+              items:
+                type: object
+                properties:
+                  key:
+                    type: string
+                  count:
+                    type: integer
+      400:
+        description: Invalid grouping
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+    """
+    by = request.args.get('by')
+    if by is not None and by not in DIMENSIONS:
+        return jsonify({"error": f"Invalid grouping '{by}'. Use one of: {', '.join(DIMENSIONS)}."}), 400
+    return jsonify(get_stats(by)), 200
+
 @api_bp.route('/books/<int:id>', methods=['GET'])
 @require_api_key
 def get_book(id):
@@ -185,25 +235,28 @@ def add_book():
     if isbn_error:
         return jsonify({"error": isbn_error}), 400
 
-    # Check if the ISBN already exists in the database
-    existing_book = Book.query.filter_by(isbn=data['isbn']).first()
-    if existing_book:
-        return jsonify({"error": "ISBN already exists. Please provide a unique ISBN."}), 409
-
     # Validate other fields
     error = validate_book_data(data)
     if error:
         return jsonify({"error": error}), 400
 
-    new_book = Book(
-        title=data['title'],
-        author=data['author'],
-        isbn=data['isbn'],
-        publish_date=datetime.strptime(data['publish_date'], '%Y-%m-%d')
-    )
-    db.session.add(new_book)
-    db.session.commit()
-    return jsonify({"message": "Book added successfully", "id": new_book.id}), 201
+    def insert_book(session):
+        # Check if the ISBN already exists in the database (including earlier writes in the same batch)
+        existing_book = session.query(Book).filter_by(isbn=data['isbn']).first()
+        if existing_book:
+            return {"error": "ISBN already exists. Please provide a unique ISBN."}, 409
+
+        new_book = Book(
+            title=data['title'],
+            author=data['author'],
+            isbn=data['isbn'],
+            publish_date=datetime.strptime(data['publish_date'], '%Y-%m-%d')
+        )
+        session.add(new_book)
+        session.flush()  # assigns new_book.id
+        return {"message": "Book added successfully", "id": new_book.id}, 201
+
+    return run_write(insert_book)
 
 @api_bp.route('/books/<int:id>', methods=['PUT'])
 @require_api_key
@@ -262,11 +315,14 @@ def update_book(id):
             error:
               type: string
               example: "Book not found"
+      409:
+        description: The update conflicts with another book (e.g. duplicate ISBN)
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
     """
-    book = db.session.get(Book, id)
-    if not book:
-        return jsonify({"error": "Book not found"}), 404
-
     data = request.get_json()
 
     # Validate ISBN
@@ -275,21 +331,31 @@ def update_book(id):
         if isbn_error:
             return jsonify({"error": isbn_error}), 400
 
-    # Update other fields
-    if 'title' in data:
-        book.title = data['title']
-    if 'author' in data:
-        book.author = data['author']
-    if 'isbn' in data:
-        book.isbn = data['isbn']
+    publish_date = None
     if 'publish_date' in data:
         try:
-            book.publish_date = datetime.strptime(data['publish_date'], '%Y-%m-%d')
+            publish_date = datetime.strptime(data['publish_date'], '%Y-%m-%d')
         except ValueError:
             return jsonify({"error": "Invalid date format for publish_date. Use YYYY-MM-DD."}), 400
 
-    db.session.commit()
-    return jsonify({"message": "Book updated successfully"}), 200
+    def apply_update(session):
+        book = session.get(Book, id)
+        if not book:
+            return {"error": "Book not found"}, 404
+
+        # Update other fields
+        if 'title' in data:
+            book.title = data['title']
+        if 'author' in data:
+            book.author = data['author']
+        if 'isbn' in data:
+            book.isbn = data['isbn']
+        if publish_date is not None:
+            book.publish_date = publish_date
+        session.flush()
+        return {"message": "Book updated successfully"}, 200
+
+    return run_write(apply_update)
 
 @api_bp.route('/books/<int:id>', methods=['DELETE'])
 @require_api_key
@@ -328,4 +394,25 @@ def delete_book(id):
 
     db.session.delete(book)
     db.session.commit()
-    return jsonify({"message": "Book deleted successfully"}), 204
\ No newline at end of file
+    return jsonify({"message": "Book deleted successfully"}), 204
+
+@api_bp.route('/metrics', methods=['GET'])
+@require_api_key
+@admission_exempt
+def get_metrics():
+    """Get this worker's operational counters.
+    ---
+    tags:
+      - Operations
+    responses:
+      200:
+        description: Counters (e.g. shed and timed-out requests) and observations for the serving worker
+        schema:
+          type: object
+          properties:
+            counters:
+              type: object
+            observations:
+              type: object
+    """
+    return jsonify(metrics.snapshot()), 200
@@ -0,0 +1,155 @@
+from collections import Counter
+
+import click
+from sqlalchemy import event, inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import db
+from .models import Book, BookStat
+
+DIMENSIONS = ('author', 'year', 'month')
+
+
+def stat_keys(author, publish_date):
+    """Return the (dimension, key) pairs a book with these values is counted under."""
+    return [
+        ('total', ''),
+        ('author', author),
+        ('year', publish_date.strftime('%Y')),
+        ('month', publish_date.strftime('%Y-%m')),
+    ]
+
+
+def _old_value(book, attr):
+    history = inspect(book).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(book, attr)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _track_book_changes(session, flush_context, instances):
+    """
+    Collect the BookStat changes for every Book inserted, updated or deleted in this flush.
+
+    The changes are only accumulated here and written once per transaction
+    in _write_book_stats, so the summary rows are updated in a fixed order
+    and committed (or rolled back) together with the books themselves.
+    Bulk Core/ORM statements bypass the session and must call
+    apply_stat_deltas themselves.
+    """
+    deltas = session.info.setdefault('stat_deltas', Counter())
+    for obj in session.new:
+        if isinstance(obj, Book):
+            deltas.update(stat_keys(obj.author, obj.publish_date))
+    for obj in session.deleted:
+        if isinstance(obj, Book):
+            deltas.subtract(stat_keys(_old_value(obj, 'author'), _old_value(obj, 'publish_date')))
+    for obj in session.dirty:
+        if isinstance(obj, Book) and session.is_modified(obj):
+            deltas.subtract(stat_keys(_old_value(obj, 'author'), _old_value(obj, 'publish_date')))
+            deltas.update(stat_keys(obj.author, obj.publish_date))
+
+
+@event.listens_for(db.session, 'before_commit')
+def _write_book_stats(session):
+    session.flush()  # commit flushes after before_commit; collect the last changes now
+    deltas = session.info.pop('stat_deltas', None)
+    if deltas:
+        apply_stat_deltas(session.connection(), deltas)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_book_stats(session):
+    session.info.pop('stat_deltas', None)
+
+
+def apply_stat_deltas(connection, deltas):
+    """Add `deltas` ({(dimension, key): change}) to the BookStat counts in one statement."""
+    rows = [
+        {"dimension": dimension, "key": key, "count": change}
+        for (dimension, key), change in sorted(deltas.items())
+        if change
+    ]
+    if not rows:
+        return
+
+    table = BookStat.__table__
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c['dimension'], table.c['key']],
+            set_={"count": table.c['count'] + stmt.excluded['count']},
+        )
+        connection.execute(stmt)
+        return
+
+    # Other databases: update in place, insert the groups that do not exist yet
+    for row in rows:
+        result = connection.execute(
+            table.update()
+            .where(table.c['dimension'] == row["dimension"], table.c['key'] == row["key"])
+            .values(count=table.c['count'] + row["count"])
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+def get_stats(by=None):
+    """
+    Read the catalogue statistics from the summary table.
+
+    Args:
+        by (str): Optional grouping, one of DIMENSIONS.
+
+    Returns:
+        dict: The total number of books and, if `by` is given, the count per group.
+    """
+    total = db.session.get(BookStat, ('total', ''))
+    result = {"total": total.count if total else 0}
+    if by:
+        groups = (
+            BookStat.query
+            .filter(BookStat.dimension == by, BookStat.count > 0)
+            .order_by(BookStat.key)
+            .all()
+        )
+        result["by"] = by
+        result["groups"] = [{"key": stat.key, "count": stat.count} for stat in groups]
+    return result
+
+
+def rebuild_stats():
+    """
+    Recompute the whole summary table from the book table (recovery only).
+
+    Book writes are blocked until the rebuild commits: on PostgreSQL by a
+    SHARE lock on book, on SQLite by the write lock the DELETE takes. On
+    other databases stop writers before running it.
+    """
+    if db.session.connection().dialect.name == 'postgresql':
+        db.session.execute(text("LOCK TABLE book IN SHARE MODE"))
+    db.session.query(BookStat).delete()
+
+    counts = Counter()
+    for author, publish_date in db.session.query(Book.author, Book.publish_date):
+        counts.update(stat_keys(author, publish_date))
+
+    db.session.add_all(
+        BookStat(dimension=dimension, key=key, count=count)
+        for (dimension, key), count in counts.items()
+    )
+    db.session.commit()
+    return counts[('total', '')]
+
+
+def init_stats(app):
+    """Register the `flask rebuild-stats` command."""
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """Rebuild the catalogue statistics table from scratch."""
+        db.create_all()  # creates book_stat on databases that predate it
+        total = rebuild_stats()
+        click.echo(f"Rebuilt catalogue statistics for {total} books.")
@@ -20,7 +20,7 @@ def api_landing():
     return redirect(url_for("app.main")) 
 
 # Enable CORS for all routes
-CORS(app, resources={r"/*": {"origins": "*", "allow_headers": "Content-Type,Authorization,X-API-Key"}})
+CORS(app, resources={r"/*": {"origins": "*", "allow_headers": "Content-Type,Authorization,X-API-Key,X-Request-Deadline-Ms", "expose_headers": "RateLimit-Limit,RateLimit-Remaining,RateLimit-Reset,Retry-After"}})
 
 @app.before_request
 def handle_options():
@@ -28,7 +28,7 @@ def handle_options():
         response = jsonify({'status': 'OK'})
         response.headers.add('Access-Control-Allow-Origin', '*')
         response.headers.add('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization, X-API-Key')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization, X-API-Key, X-Request-Deadline-Ms')
         return response, 204
 
 if __name__ == "__main__":
@@ -23,6 +23,10 @@ def init_swagger(app):
             {
                 "name": "Books",
                 "description": "Operations related to managing books"
+            },
+            {
+                "name": "Operations",
+                "description": "Operational endpoints such as metrics"
             }
         ],
         "securityDefinitions": {
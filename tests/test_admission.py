@@ -0,0 +1,89 @@
+import time
+import unittest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from main import app, db
+from api.admission import AdmissionController
+from api.metrics import metrics
+
+SLOW_QUERY = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000) SELECT count(*) FROM c"
+
+class TestAdmissionControl(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client with a fresh database and admission state."""
+        self.app = app.test_client()
+        self.app.testing = True
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+        self.original_controller = app.extensions['admission']
+        metrics.reset()
+
+    def tearDown(self):
+        """Restore the admission controller and clean up the database."""
+        app.extensions['admission'] = self.original_controller
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_shed_when_queue_is_full(self):
+        """Test that a request is shed with 503 and Retry-After when no slot or queue space is left."""
+        controller = AdmissionController(max_inflight=1, max_queue=0, queue_timeout=0, latency_threshold_ms=0)
+        controller.acquire(timeout=0)  # occupy the only slot
+        app.extensions['admission'] = controller
+
+        response = self.app.get('/api/books', headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(metrics.snapshot()['counters']['requests_shed'], 1)
+
+    def test_shed_when_latency_is_high(self):
+        """Test that requests are shed instead of queued once recent latency crosses the threshold."""
+        controller = AdmissionController(max_inflight=1, max_queue=10, queue_timeout=1, latency_threshold_ms=100)
+        controller.acquire(timeout=0)
+        controller.latency_ms = 500
+        app.extensions['admission'] = controller
+
+        response = self.app.get('/api/books', headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(metrics.snapshot()['counters']['requests_shed.latency'], 1)
+
+    def test_slot_released_after_request(self):
+        """Test that in-flight slots are given back once a request finishes."""
+        controller = AdmissionController(max_inflight=1, max_queue=0, queue_timeout=0, latency_threshold_ms=0)
+        app.extensions['admission'] = controller
+
+        for _ in range(3):
+            response = self.app.get('/api/books', headers={"X-API-Key": "fake-key"})
+            self.assertEqual(response.status_code, 200)
+
+    def test_client_deadline_exceeded(self):
+        """Test that an already expired client deadline is answered with 504."""
+        response = self.app.get('/api/books', headers={"X-API-Key": "fake-key", "X-Request-Deadline-Ms": "0"})
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(metrics.snapshot()['counters']['requests_timed_out'], 1)
+
+    def test_deadline_applies_to_every_transaction(self):
+        """Test that the database timeout is re-applied after a commit and removed once the request ends."""
+        with app.test_request_context('/api/books'):
+            g.deadline = time.monotonic() - 1  # already expired
+            db.session.execute(text("SELECT 1"))
+            db.session.commit()
+            with self.assertRaises(OperationalError):
+                db.session.execute(text(SLOW_QUERY))
+            db.session.rollback()
+            db.session.remove()
+
+        # The connection went back to the pool; a later user must not inherit the old deadline
+        with app.app_context():
+            self.assertEqual(db.session.execute(text(SLOW_QUERY)).scalar(), 100000)
+
+    def test_metrics_endpoint(self):
+        """Test that the metrics endpoint reports counters."""
+        response = self.app.get('/api/metrics', headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('counters', response.json)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from sqlalchemy.exc import SQLAlchemyError
+from main import app, db
+from api.auth import ApiKeyIndex, hash_api_key
+from api.metrics import metrics
+from api.models import ApiKey
+from api.ratelimit import SQLiteRateLimiter
+
+class TestApiKeys(unittest.TestCase):
+    def setUp(self):
+        """Set up a fresh database, key index and rate limiter state."""
+        self.app = app.test_client()
+        self.app.testing = True
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+        self.original_index = app.extensions['api_keys']
+        self.original_limiter = app.extensions['rate_limiter']
+        self.tmpdir = tempfile.TemporaryDirectory()
+        app.extensions['api_keys'] = ApiKeyIndex(refresh_seconds=0)
+        app.extensions['rate_limiter'] = SQLiteRateLimiter(os.path.join(self.tmpdir.name, 'ratelimit.db'), 86400)
+        metrics.reset()
+
+    def tearDown(self):
+        """Restore the original index and limiter and clean up."""
+        app.extensions['api_keys'] = self.original_index
+        app.extensions['rate_limiter'] = self.original_limiter
+        self.tmpdir.cleanup()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _create_key(self, name, key, **limits):
+        with app.app_context():
+            db.session.add(ApiKey(name=name, key_hash=hash_api_key(key), **limits))
+            db.session.commit()
+
+    def test_stored_key_is_accepted(self):
+        """Test that a key stored (hashed) in the database authenticates next to the static key."""
+        self._create_key("tenant-a", "tenant-a-secret")
+        response = self.app.get('/api/books', headers={"X-API-Key": "tenant-a-secret"})
+        self.assertEqual(response.status_code, 200)
+        response = self.app.get('/api/books', headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_revoked_key_is_rejected(self):
+        """Test that revoking a key in use takes effect on the next index refresh, without a restart."""
+        self._create_key("tenant-a", "tenant-a-secret")
+        response = self.app.get('/api/books', headers={"X-API-Key": "tenant-a-secret"})
+        self.assertEqual(response.status_code, 200)
+
+        with app.app_context():
+            ApiKey.query.filter_by(name="tenant-a").first().active = False
+            db.session.commit()
+        response = self.app.get('/api/books', headers={"X-API-Key": "tenant-a-secret"})
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_does_not_block_lookups(self):
+        """Test that requests keep using the current keys while another thread is refreshing them."""
+        response = self.app.get('/api/books', headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 200)
+
+        index = app.extensions['api_keys']
+        with index._lock:  # a refresh is running elsewhere
+            response = self.app.get('/api/books', headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_refresh_failure_keeps_previous_keys(self):
+        """Test that a failing reload keeps the keys loaded before."""
+        self._create_key("tenant-a", "tenant-a-secret")
+        response = self.app.get('/api/books', headers={"X-API-Key": "tenant-a-secret"})
+        self.assertEqual(response.status_code, 200)
+
+        with patch.object(ApiKey.__table__.c.active, 'is_', side_effect=SQLAlchemyError("database unavailable")), \
+                self.assertLogs(app.logger, 'ERROR'):
+            response = self.app.get('/api/books', headers={"X-API-Key": "tenant-a-secret"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_rate_limit_headers(self):
+        """Test that successful responses carry RateLimit-* headers."""
+        response = self.app.get('/api/books', headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['RateLimit-Limit'], str(app.config['RATE_LIMIT_DEFAULT_BURST']))
+        self.assertIn('RateLimit-Remaining', response.headers)
+        self.assertIn('RateLimit-Reset', response.headers)
+
+    def test_rate_limit_is_per_key(self):
+        """Test that an exhausted bucket returns 429 for that key only."""
+        self._create_key("batch-job", "batch-secret", rate_limit=0.01, burst=2)
+        for _ in range(2):
+            response = self.app.get('/api/books', headers={"X-API-Key": "batch-secret"})
+            self.assertEqual(response.status_code, 200)
+
+        response = self.app.get('/api/books', headers={"X-API-Key": "batch-secret"})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(response.headers['RateLimit-Remaining'], '0')
+
+        # Other clients are unaffected
+        response = self.app.get('/api/books', headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_quota(self):
+        """Test that a key is refused once its quota for the period is used up."""
+        self._create_key("limited", "limited-secret", quota=1)
+        response = self.app.get('/api/books', headers={"X-API-Key": "limited-secret"})
+        self.assertEqual(response.status_code, 200)
+        response = self.app.get('/api/books', headers={"X-API-Key": "limited-secret"})
+        self.assertEqual(response.status_code, 429)
+
+    def test_limiter_failure_fails_open(self):
+        """Test that a locked or broken limiter file does not turn requests into 500s."""
+        limiter = app.extensions['rate_limiter']
+        with patch.object(limiter, '_connect', side_effect=sqlite3.OperationalError("database is locked")):
+            response = self.app.get('/api/books', headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(metrics.snapshot()['counters']['rate_limiter_errors'], 1)
+
+    def test_limiter_reuses_connections_across_threads(self):
+        """Test that limiter connections are pooled per process, not opened per request thread."""
+        limiter = app.extensions['rate_limiter']
+        with patch.object(limiter, '_connect', wraps=limiter._connect) as connect:
+            for _ in range(3):
+                thread = threading.Thread(target=limiter.hit, args=("key", 10, 100))
+                thread.start()
+                thread.join()
+            self.assertEqual(connect.call_count, 1)
+
+            # A forked worker must open its own connections instead of reusing the parent's
+            limiter._pid = -1
+            limiter.hit("key", 10, 100)
+            self.assertEqual(connect.call_count, 2)
+
+    def test_zero_rate_means_quota_only(self):
+        """Test that a key with rate 0 has no token bucket and is only limited by its quota."""
+        self._create_key("quota-only", "quota-secret", rate_limit=0, burst=1, quota=3)
+        for remaining in ('2', '1', '0'):
+            response = self.app.get('/api/books', headers={"X-API-Key": "quota-secret"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['RateLimit-Limit'], '3')
+            self.assertEqual(response.headers['RateLimit-Remaining'], remaining)
+        response = self.app.get('/api/books', headers={"X-API-Key": "quota-secret"})
+        self.assertEqual(response.status_code, 429)
+
+    def test_zero_rate_without_quota_is_unlimited(self):
+        """Test that a key with neither a rate nor a quota is not limited and gets no RateLimit-* headers."""
+        self._create_key("unlimited", "unlimited-secret", rate_limit=0, burst=1, quota=0)
+        for _ in range(3):
+            response = self.app.get('/api/books', headers={"X-API-Key": "unlimited-secret"})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('RateLimit-Limit', response.headers)
+
+if __name__ == '__main__':
+    unittest.main()
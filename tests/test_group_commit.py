@@ -0,0 +1,187 @@
+import threading
+import time
+import unittest
+from main import app, db
+from api.models import Book
+from api.admission import DeadlineExceeded
+from api.group_commit import GroupCommitter
+from api.metrics import metrics
+
+class TestGroupCommit(unittest.TestCase):
+    def setUp(self):
+        """Enable write coalescing with a window long enough to batch concurrent test requests."""
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+        app.extensions['group_commit'] = GroupCommitter(window_ms=200, max_batch=4)
+        metrics.reset()
+
+    def tearDown(self):
+        """Disable write coalescing and clean up the database."""
+        app.extensions.pop('group_commit', None)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _post_concurrently(self, isbns, headers=None, stagger=0):
+        responses = {}
+        elapsed = {}
+
+        def post(isbn, index):
+            client = app.test_client()
+            start = time.monotonic()
+            responses[index] = client.post('/api/books', json={
+                "title": f"Book {index}",
+                "author": "Author Name",
+                "isbn": isbn,
+                "publish_date": "2024-01-01"
+            }, headers={"X-API-Key": "fake-key", **((headers or {}).get(index, {}))})
+            elapsed[index] = time.monotonic() - start
+
+        threads = [threading.Thread(target=post, args=(isbn, i)) for i, isbn in enumerate(isbns)]
+        for thread in threads:
+            thread.start()
+            time.sleep(stagger)
+        for thread in threads:
+            thread.join()
+        self.elapsed = [elapsed[i] for i in range(len(isbns))]
+        return [responses[i] for i in range(len(isbns))]
+
+    def test_concurrent_inserts_share_a_commit(self):
+        """Test that concurrent inserts are committed in one batch and each gets its own id."""
+        responses = self._post_concurrently(["1000000000001", "1000000000002", "1000000000003", "1000000000004"])
+
+        self.assertEqual([r.status_code for r in responses], [201] * 4)
+        self.assertEqual(len({r.json['id'] for r in responses}), 4)
+        observations = metrics.snapshot()['observations']
+        self.assertEqual(observations['group_commit.batch_size']['max'], 4)
+        with app.app_context():
+            self.assertEqual(Book.query.count(), 4)
+
+    def test_conflict_in_batch_only_fails_that_request(self):
+        """Test that a duplicate ISBN inside a batch returns 409 for that request only."""
+        responses = self._post_concurrently(["2000000000001", "2000000000001", "2000000000002"])
+
+        self.assertEqual(sorted(r.status_code for r in responses), [201, 201, 409])
+        with app.app_context():
+            self.assertEqual(Book.query.count(), 2)
+
+    def test_follower_respects_its_own_deadline(self):
+        """Test that a queued write gives up at its own deadline instead of waiting for the batch."""
+        app.extensions['group_commit'] = GroupCommitter(window_ms=400, max_batch=4)
+        responses = self._post_concurrently(
+            ["6000000000001", "6000000000002"],
+            headers={1: {"X-Request-Deadline-Ms": "150"}},
+            stagger=0.05,
+        )
+
+        self.assertEqual(responses[0].status_code, 201)
+        self.assertEqual(responses[1].status_code, 504)
+        self.assertLess(self.elapsed[1], 0.3)
+        with app.app_context():
+            self.assertEqual(Book.query.count(), 1)
+
+    def test_short_budget_write_is_committed_alone(self):
+        """Test that a write with less than the minimum budget left skips the batch instead of timing it out."""
+        app.extensions['group_commit'] = GroupCommitter(window_ms=400, max_batch=4, min_budget_ms=50)
+        responses = self._post_concurrently(
+            ["7000000000001", "7000000000002"],
+            headers={1: {"X-Request-Deadline-Ms": "40"}},
+            stagger=0.05,
+        )
+
+        self.assertEqual([r.status_code for r in responses], [201, 201])
+        self.assertLess(self.elapsed[1], 0.3)
+        self.assertEqual(metrics.snapshot()['observations']['group_commit.batch_size']['max'], 1)
+
+    def test_follower_in_slow_batch_stops_at_its_deadline(self):
+        """Test that a follower already inside a slow batch still answers at its own deadline."""
+        committer = GroupCommitter(window_ms=100, max_batch=2)
+        outcomes, elapsed = {}, {}
+
+        def slow_op(session):
+            time.sleep(1)
+            return {"message": "slow"}, 200
+
+        def fast_op(session):
+            return {"message": "fast"}, 200
+
+        def submit(name, op, budget):
+            with app.app_context():
+                start = time.monotonic()
+                try:
+                    outcomes[name] = committer.submit(op, deadline=start + budget)
+                except DeadlineExceeded as e:
+                    outcomes[name] = e
+                elapsed[name] = time.monotonic() - start
+
+        leader = threading.Thread(target=submit, args=("leader", slow_op, 5))
+        follower = threading.Thread(target=submit, args=("follower", fast_op, 0.3))
+        leader.start()
+        time.sleep(0.02)
+        follower.start()
+        follower.join()
+        leader.join()
+
+        self.assertIsInstance(outcomes["follower"], DeadlineExceeded)
+        self.assertLess(elapsed["follower"], 0.6)
+        self.assertEqual(outcomes["leader"], ({"message": "slow"}, 200))
+
+    def test_concurrent_updates_beyond_pool_size(self):
+        """Test that more concurrent updates than pooled connections do not starve the batch."""
+        client = app.test_client()
+        with app.app_context():
+            pool_size = db.engine.pool.size() + db.engine.pool._max_overflow
+        count = pool_size + 1
+        book_ids = []
+        for i in range(count):
+            response = client.post('/api/books', json={
+                "title": "Book",
+                "author": "Author Name",
+                "isbn": f"{8000000000000 + i}",
+                "publish_date": "2024-01-01"
+            }, headers={"X-API-Key": "fake-key"})
+            book_ids.append(response.json['id'])
+
+        app.extensions['group_commit'] = GroupCommitter(window_ms=200, max_batch=32)
+        responses = {}
+
+        def put(book_id):
+            responses[book_id] = app.test_client().put(
+                f'/api/books/{book_id}', json={"title": "Updated"}, headers={"X-API-Key": "fake-key"})
+
+        start = time.monotonic()
+        threads = [threading.Thread(target=put, args=(book_id,)) for book_id in book_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual({r.status_code for r in responses.values()}, {200})
+        with app.app_context():
+            self.assertEqual(Book.query.filter_by(title="Updated").count(), count)
+
+    def test_update_missing_book(self):
+        """Test that updating an unknown book still returns 404 with coalescing enabled."""
+        response = app.test_client().put('/api/books/999', json={"title": "Updated"}, headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_update_through_group_commit(self):
+        """Test that a single update still succeeds when coalescing is enabled."""
+        client = app.test_client()
+        response = client.post('/api/books', json={
+            "title": "Book",
+            "author": "Author Name",
+            "isbn": "3000000000001",
+            "publish_date": "2024-01-01"
+        }, headers={"X-API-Key": "fake-key"})
+        book_id = response.json['id']
+
+        response = client.put(f'/api/books/{book_id}', json={"title": "Updated"}, headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 200)
+        with app.app_context():
+            self.assertEqual(db.session.get(Book, book_id).title, "Updated")
+
+if __name__ == '__main__':
+    unittest.main()
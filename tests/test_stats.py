@@ -0,0 +1,108 @@
+import unittest
+from datetime import date
+from main import app, db
+from api.models import Book, BookStat
+from api.stats import rebuild_stats
+
+class TestBookStats(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client with an empty database."""
+        self.app = app.test_client()
+        self.app.testing = True
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _add_book(self, isbn, author, publish_date):
+        response = self.app.post('/api/books', json={
+            "title": "Stats Book",
+            "author": author,
+            "isbn": isbn,
+            "publish_date": publish_date
+        }, headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 201)
+        return response.json['id']
+
+    def _stats(self, by=None):
+        url = f'/api/books/stats?by={by}' if by else '/api/books/stats'
+        response = self.app.get(url, headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def test_stats_follow_add_update_delete(self):
+        """Test that the summary table is kept in step with book writes."""
+        first = self._add_book("4000000000001", "Author A", "2023-05-01")
+        self._add_book("4000000000002", "Author A", "2024-01-15")
+        self._add_book("4000000000003", "Author B", "2024-01-20")
+
+        self.assertEqual(self._stats()['total'], 3)
+        self.assertEqual(self._stats('author')['groups'], [
+            {"key": "Author A", "count": 2},
+            {"key": "Author B", "count": 1},
+        ])
+        self.assertEqual(self._stats('month')['groups'], [
+            {"key": "2023-05", "count": 1},
+            {"key": "2024-01", "count": 2},
+        ])
+
+        # Moving a book to another author and year shifts its counts
+        response = self.app.put(f'/api/books/{first}', json={
+            "author": "Author B",
+            "publish_date": "2024-03-01"
+        }, headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._stats('year')['groups'], [{"key": "2024", "count": 3}])
+
+        response = self.app.delete(f'/api/books/{first}', headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 204)
+        stats = self._stats('author')
+        self.assertEqual(stats['total'], 2)
+        self.assertEqual(stats['groups'], [
+            {"key": "Author A", "count": 1},
+            {"key": "Author B", "count": 1},
+        ])
+
+    def test_stats_written_once_per_transaction(self):
+        """Test that changes from several flushes are applied at commit and dropped on rollback."""
+        with app.app_context():
+            db.session.add(Book(title="A", author="Author A", isbn="6000000000001", publish_date=date(2024, 1, 1)))
+            db.session.flush()
+            db.session.add(Book(title="B", author="Author A", isbn="6000000000002", publish_date=date(2024, 1, 1)))
+            db.session.flush()
+            self.assertIsNone(db.session.get(BookStat, ('total', '')))  # nothing written before commit
+            db.session.commit()
+
+            db.session.add(Book(title="C", author="Author B", isbn="6000000000003", publish_date=date(2024, 1, 1)))
+            db.session.flush()
+            db.session.rollback()
+        self.assertEqual(self._stats('author')['groups'], [{"key": "Author A", "count": 2}])
+
+    def test_invalid_grouping(self):
+        """Test that an unknown grouping is rejected."""
+        response = self.app.get('/api/books/stats?by=isbn', headers={"X-API-Key": "fake-key"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_stats(self):
+        """Test that a rebuild restores the summary table after it has been lost."""
+        self._add_book("5000000000001", "Author A", "2024-01-01")
+        self._add_book("5000000000002", "Author B", "2024-02-01")
+        with app.app_context():
+            BookStat.query.delete()
+            db.session.commit()
+        self.assertEqual(self._stats()['total'], 0)
+
+        with app.app_context():
+            self.assertEqual(rebuild_stats(), 2)
+        self.assertEqual(self._stats('author')['groups'], [
+            {"key": "Author A", "count": 1},
+            {"key": "Author B", "count": 1},
+        ])
+
+if __name__ == '__main__':
+    unittest.main()